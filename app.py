@@ -1,8 +1,14 @@
-from flask import Flask, render_template, jsonify, send_from_directory, request
+from flask import Flask, render_template, jsonify, send_from_directory, request, Response
 import os
 import re
 import random
+import gzip
+import hashlib
+import threading
 from datetime import datetime
+from email.utils import format_datetime
+from urllib.parse import quote
+from xml.sax.saxutils import escape, quoteattr
 import markdown
 import frontmatter
 from pathlib import Path
@@ -15,6 +21,16 @@ app = Flask(__name__)
 UPLOAD_FOLDER = 'content/assets'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp', 'svg'}
 
+# Feed settings
+SITE_TITLE = 'MINIQuaily - Iamcheyan'
+# 站点的规范地址（如 https://example.com/），feed和sitemap中的链接都基于它生成
+# 未配置时退回到请求的url_root，此时缓存按主机名区分并受FEED_CACHE_MAX_ENTRIES限制
+SITE_URL = os.environ.get('SITE_URL', '')
+FEED_ENTRY_LIMIT = 20
+FEED_CACHE_MAX_ENTRIES = 512
+# 两次扫描content目录之间的最短间隔（秒），避免每个请求都stat全部文件
+GENERATION_CHECK_INTERVAL = 2.0
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -27,6 +43,68 @@ def ensure_upload_folder():
 class MemoParser:
     def __init__(self, content_dir="content"):
         self.content_dir = content_dir
+        self._generation = None
+        self._generation_checked_at = 0.0
+        self._html_cache = {}
+        self._lock = threading.Lock()
+    
+    def _scan_generation(self):
+        """根据所有md文件的文件名、修改时间和大小计算语料库版本号"""
+        digest = hashlib.sha1()
+        content_path = Path(self.content_dir)
+        if content_path.exists():
+            for year_dir in sorted(content_path.iterdir()):
+                if year_dir.is_dir() and year_dir.name.isdigit():
+                    for entry in sorted(os.scandir(year_dir), key=lambda e: e.name):
+                        if entry.name.endswith('.md') and entry.is_file():
+                            stat = entry.stat()
+                            digest.update(f"{year_dir.name}/{entry.name}:{stat.st_mtime_ns}:{stat.st_size}\n".encode('utf-8'))
+        return digest.hexdigest()
+    
+    def get_generation(self):
+        """获取当前语料库版本号，内容有增删改时才会变化"""
+        with self._lock:
+            now = time.monotonic()
+            if self._generation is None or now - self._generation_checked_at >= GENERATION_CHECK_INTERVAL:
+                generation = self._scan_generation()
+                if generation != self._generation:
+                    self._prune_html_cache()
+                self._generation = generation
+                self._generation_checked_at = now
+            return self._generation
+    
+    def invalidate(self):
+        """内容被修改后调用，下次请求时立即重新计算版本号"""
+        with self._lock:
+            self._generation = None
+            self._prune_html_cache()
+    
+    def _prune_html_cache(self):
+        """丢弃已删除文件的HTML缓存（调用方需持有锁）"""
+        for filepath in [path for path in self._html_cache if not os.path.exists(path)]:
+            del self._html_cache[filepath]
+    
+    def render_html(self, memo):
+        """将memo的markdown内容渲染为HTML，按文件路径和内容摘要缓存"""
+        filepath = memo['filepath']
+        content = memo['content']
+        # 用渲染所用内容本身的摘要作为缓存键，保证缓存的HTML与内容一致
+        digest = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        
+        with self._lock:
+            cached = self._html_cache.get(filepath)
+        if cached and cached[0] == digest:
+            return cached[1]
+        
+        md = markdown.Markdown(extensions=['extra', 'codehilite'])
+        
+        # 修复相对路径的图片引用，将 ../../assets/ 替换为 /assets/
+        content = re.sub(r'\.\./.\./assets/', '/assets/', content)
+        
+        html = md.convert(content)
+        with self._lock:
+            self._html_cache[filepath] = (digest, html)
+        return html
         
     def parse_filename(self, filename):
         """从文件名解析日期和标题"""
@@ -218,8 +296,196 @@ class MemoParser:
         memos.sort(key=lambda x: x['timestamp'], reverse=True)
         return memos
 
+class FeedCache:
+    """按语料库版本号缓存生成好的feed和sitemap（原始字节、gzip字节和ETag）"""
+    def __init__(self, parser):
+        self.parser = parser
+        self._generation = None
+        self._memos = None
+        self._tags = None
+        self._entries = {}
+        self._lock = threading.Lock()
+    
+    def _sync(self, generation):
+        """语料库版本号变化时丢弃所有旧缓存（调用方需持有锁）"""
+        if generation != self._generation:
+            self._generation = generation
+            self._memos = None
+            self._tags = None
+            self._entries = {}
+    
+    def _load(self):
+        """同步到当前语料库版本并返回memo列表，同一版本只解析一次（调用方需持有锁）"""
+        self._sync(self.parser.get_generation())
+        if self._memos is None:
+            self._memos = self.parser.get_all_memos()
+            self._tags = build_tag_map(self._memos)
+        return self._memos
+    
+    def _get_entry(self, key, build):
+        """返回key对应的缓存条目，不存在时调用build生成（调用方需持有锁）"""
+        entry = self._entries.get(key)
+        if entry is None:
+            body = build().encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()
+            entry = {
+                'body': body,
+                'gzip_body': gzip.compress(body, compresslevel=9, mtime=0),
+                'etag': etag,
+            }
+            # 超出上限时淘汰最早生成的条目
+            while len(self._entries) >= FEED_CACHE_MAX_ENTRIES:
+                self._entries.pop(next(iter(self._entries)))
+            self._entries[key] = entry
+        return entry
+    
+    def get(self, key, build):
+        """获取缓存的feed，版本号未变化时直接返回，否则调用build(memos, render)重新生成"""
+        # 版本检查、memo加载和生成都在同一次加锁中完成，避免用旧memo生成的结果写入新版本的缓存
+        with self._lock:
+            memos = self._load()
+            return self._get_entry(key, lambda: build(memos, self.parser.render_html))
+    
+    def get_tag(self, tag, base_url, build):
+        """获取单个标签的缓存feed，标签按当前版本的写法规范化，不存在时返回None"""
+        with self._lock:
+            memos = self._load()
+            tag = self._tags.get(tag.lower())
+            if tag is None:
+                return None
+            return self._get_entry(('tag-rss', tag, base_url),
+                                   lambda: build(memos, self.parser.render_html, tag))
+
+def get_site_url():
+    """获取站点的规范地址，以/结尾"""
+    if SITE_URL:
+        return SITE_URL.rstrip('/') + '/'
+    return request.url_root
+
+def filter_memos_by_tag(memos, tag):
+    """筛选包含指定标签的memo（不区分大小写）"""
+    return [m for m in memos if any(t.lower() == tag.lower() for t in m.get('tags', []))]
+
+def build_tag_map(memos):
+    """建立小写标签到其最常用写法的映射"""
+    counts = {}
+    for memo in memos:
+        for tag in memo.get('tags', []):
+            if tag:
+                counts[tag] = counts.get(tag, 0) + 1
+    
+    tag_map = {}
+    # 次数相同时按字典序取第一个，保证结果稳定
+    for tag in sorted(counts, key=lambda t: (-counts[t], t)):
+        tag_map.setdefault(tag.lower(), tag)
+    return tag_map
+
+def memo_entry_id(memo):
+    """生成memo在feed中的稳定标识，基于年份目录和文件名，不随memo的id变化"""
+    return f"urn:miniquaily:memo:{quote(memo['year'])}/{quote(memo['filename'])}"
+
+def absolutize_urls(html, base_url):
+    """将HTML中以/开头的src和href转换为绝对地址，供feed阅读器使用"""
+    return re.sub(r'(src|href)="/(?!/)', lambda m: f'{m.group(1)}="{base_url}', html)
+
+def build_rss(memos, render, base_url, title, link, self_url):
+    """生成RSS 2.0格式的feed，render用于将memo渲染为HTML"""
+    items = []
+    for memo in memos[:FEED_ENTRY_LIMIT]:
+        memo_url = f"{base_url}memo/{memo['id']}"
+        body = absolutize_urls(render(memo), base_url)
+        categories = ''.join(f"<category>{escape(tag)}</category>" for tag in memo.get('tags', []))
+        items.append(
+            f"<item><title>{escape(str(memo['title']))}</title>"
+            f"<link>{escape(memo_url)}</link>"
+            f"<guid isPermaLink=\"false\">{escape(memo_entry_id(memo))}</guid>"
+            f"<pubDate>{format_datetime(memo['timestamp'].astimezone())}</pubDate>"
+            f"{categories}"
+            f"<description>{escape(body)}</description></item>"
+        )
+    
+    last_build = memos[0]['timestamp'] if memos else datetime.now()
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"><channel>'
+        f"<title>{escape(title)}</title>"
+        f"<link>{escape(link)}</link>"
+        f"<description>{escape(title)}</description>"
+        f"<atom:link href=\"{escape(self_url)}\" rel=\"self\" type=\"application/rss+xml\"/>"
+        f"<lastBuildDate>{format_datetime(last_build.astimezone())}</lastBuildDate>"
+        f"{''.join(items)}"
+        '</channel></rss>\n'
+    )
+
+def build_atom(memos, render, base_url, title, link, self_url):
+    """生成Atom格式的feed，render用于将memo渲染为HTML"""
+    entries = []
+    for memo in memos[:FEED_ENTRY_LIMIT]:
+        memo_url = f"{base_url}memo/{memo['id']}"
+        body = absolutize_urls(render(memo), base_url)
+        categories = ''.join(f"<category term={quoteattr(tag)}/>" for tag in memo.get('tags', []))
+        entries.append(
+            f"<entry><title>{escape(str(memo['title']))}</title>"
+            f"<link href=\"{escape(memo_url)}\"/>"
+            f"<id>{escape(memo_entry_id(memo))}</id>"
+            f"<updated>{memo['timestamp'].astimezone().isoformat()}</updated>"
+            f"<author><name>{escape(memo['author'])}</name></author>"
+            f"{categories}"
+            f"<content type=\"html\">{escape(body)}</content></entry>"
+        )
+    
+    updated = memos[0]['timestamp'] if memos else datetime.now()
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom">'
+        f"<title>{escape(title)}</title>"
+        f"<link href=\"{escape(link)}\"/>"
+        f"<link href=\"{escape(self_url)}\" rel=\"self\"/>"
+        f"<id>{escape(link)}</id>"
+        f"<updated>{updated.astimezone().isoformat()}</updated>"
+        f"{''.join(entries)}"
+        '</feed>\n'
+    )
+
+def build_sitemap(memos, base_url):
+    """生成sitemap.xml，包含首页、标签页和所有文章"""
+    urls = [f"<url><loc>{escape(base_url)}</loc></url>",
+            f"<url><loc>{escape(base_url)}tags</loc></url>"]
+    
+    tags = sorted(build_tag_map(memos).values())
+    for tag in tags:
+        urls.append(f"<url><loc>{escape(base_url)}tag/{escape(quote(tag))}</loc></url>")
+    
+    for memo in memos:
+        urls.append(
+            f"<url><loc>{escape(base_url)}memo/{memo['id']}</loc>"
+            f"<lastmod>{memo['timestamp'].strftime('%Y-%m-%d')}</lastmod></url>"
+        )
+    
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+        f"{''.join(urls)}"
+        '</urlset>\n'
+    )
+
+def cached_xml_response(entry, content_type):
+    """返回预压缩的缓存内容，支持ETag条件请求"""
+    use_gzip = request.accept_encodings['gzip'] > 0
+    etag = entry['etag'] + ('-gzip' if use_gzip else '')
+    
+    response = Response(entry['gzip_body'] if use_gzip else entry['body'], content_type=content_type)
+    if use_gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, no-cache'
+    # 交给框架处理If-None-Match（弱比较），命中时返回304
+    return response.make_conditional(request)
+
 # 创建解析器实例
 memo_parser = MemoParser()
+feed_cache = FeedCache(memo_parser)
 
 @app.route('/')
 def index():
@@ -259,7 +525,7 @@ def get_memo(memo_id):
     else:
         return jsonify({'error': 'Memo not found'}), 404
 
-@app.route('/tag/<tag>')
+@app.route('/tag/<path:tag>')
 def tag_page(tag):
     """标签页面"""
     return render_template('index.html')
@@ -269,6 +535,44 @@ def tags_page():
     """标签列表页面"""
     return render_template('index.html')
 
+@app.route('/feed.xml')
+def rss_feed():
+    """全站RSS feed"""
+    base_url = get_site_url()
+    entry = feed_cache.get(('rss', base_url), lambda memos, render: build_rss(
+        memos, render, base_url, SITE_TITLE, base_url, f"{base_url}feed.xml"))
+    return cached_xml_response(entry, 'application/rss+xml; charset=utf-8')
+
+@app.route('/atom.xml')
+def atom_feed():
+    """全站Atom feed"""
+    base_url = get_site_url()
+    entry = feed_cache.get(('atom', base_url), lambda memos, render: build_atom(
+        memos, render, base_url, SITE_TITLE, base_url, f"{base_url}atom.xml"))
+    return cached_xml_response(entry, 'application/atom+xml; charset=utf-8')
+
+@app.route('/tag/<path:tag>/feed.xml')
+def tag_feed(tag):
+    """单个标签的RSS feed"""
+    base_url = get_site_url()
+    
+    def build(memos, render, tag):
+        tag_url = f"{base_url}tag/{quote(tag)}"
+        return build_rss(filter_memos_by_tag(memos, tag), render, base_url, f"{SITE_TITLE} - #{tag}",
+                         tag_url, f"{tag_url}/feed.xml")
+    
+    entry = feed_cache.get_tag(tag, base_url, build)
+    if entry is None:
+        return "标签未找到", 404
+    return cached_xml_response(entry, 'application/rss+xml; charset=utf-8')
+
+@app.route('/sitemap.xml')
+def sitemap():
+    """站点地图"""
+    base_url = get_site_url()
+    entry = feed_cache.get(('sitemap', base_url), lambda memos, render: build_sitemap(memos, base_url))
+    return cached_xml_response(entry, 'application/xml; charset=utf-8')
+
 @app.route('/memo/<int:memo_id>')
 def memo_detail(memo_id):
     """显示单个memo的完整内容页面"""
@@ -294,13 +598,7 @@ def memo_detail(memo_id):
         memo['time_ago'] = time_ago
         
         # 将markdown内容转换为HTML，并修复图片路径
-        md = markdown.Markdown(extensions=['extra', 'codehilite'])
-        content = memo['content']
-        
-        # 修复相对路径的图片引用，将 ../../assets/ 替换为 /assets/
-        content = re.sub(r'\.\./.\./assets/', '/assets/', content)
-        
-        memo['content'] = md.convert(content)
+        memo['content'] = memo_parser.render_html(memo)
         
         return render_template('memo_detail.html', memo=memo)
     else:
@@ -544,6 +842,8 @@ def save_log():
         with open(filepath, 'w', encoding='utf-8') as f:
             f.write(frontmatter.dumps(post))
         
+        memo_parser.invalidate()
+        
         return jsonify({
             'success': True,
             'message': '日志保存成功',
@@ -642,6 +942,7 @@ def delete_memo(memo_id):
             
             # 删除markdown文件
             os.remove(memo_file_path)
+            memo_parser.invalidate()
             
             return jsonify({
                 'success': True,